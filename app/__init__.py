@@ -10,7 +10,9 @@ from flask import Flask
 from flask_cors import CORS
 from flask_socketio import SocketIO
 from .extensions import db 
+from . import json_encoding
 from .socket_server import start_socketio_listeners
+from .subscriptions import register_subscription_handlers
 from .utils import schedule_echo_deletion
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -43,11 +45,18 @@ def create_app():
     
     with app.app_context(): 
         db.create_all()
+
+        # create_all() skips existing tables, so also create indexes added after the table was created
+        from .models import EchoCounts
+        for index in EchoCounts.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
         
     schedule_echo_deletion(app)
 
     # Configure SocketIO
-    socketio = SocketIO(app, cors_allowed_origins=ALLOWED_ORIGINS)
+    # Packets are pre-encoded once with orjson (see json_encoding.py), so use it for Socket.IO too
+    socketio = SocketIO(app, cors_allowed_origins=ALLOWED_ORIGINS, json=json_encoding, serializer=json_encoding.EventCountingPacket)
+    register_subscription_handlers(socketio)
     start_socketio_listeners(socketio, app)
 
     # Configure CORS
@@ -0,0 +1,70 @@
+"""
+Suppresses duplicate records, e.g. a radar received over both a direct TCP feed and the
+Canadian ZMQ relay, or a reconnecting feed resending its last record.
+
+Duplicates are detected per site with a bounded LRU of recently seen keys: first on a hash
+of the raw frame (before it is decoded), then on the (stid, time, bmnum, scan) of the decoded
+record, since the same record can be framed differently by different sources.
+"""
+import os
+import logging
+from collections import Counter, OrderedDict
+
+DEDUP_CACHE_SIZE = int(os.getenv('DEDUP_CACHE_SIZE', 1024))  # Number of recent keys remembered per site
+
+# Recently seen keys per site, least recently seen first
+_seen_keys = {}
+
+# Number of duplicate records dropped per site
+duplicate_counts = Counter()
+
+
+def _check_and_remember(site_name: str, key) -> bool:
+    """Returns True if `key` was recently seen for `site_name`, and remembers it"""
+    seen = _seen_keys.setdefault(site_name, OrderedDict())
+
+    if key in seen:
+        seen.move_to_end(key)
+        duplicate_counts[site_name] += 1
+        logging.debug(f"Dropped duplicate record for {site_name} ({duplicate_counts[site_name]} total)")
+        return True
+
+    seen[key] = None
+    if len(seen) > DEDUP_CACHE_SIZE:
+        seen.popitem(last=False)
+
+    return False
+
+
+def is_duplicate_frame(raw_data: bytes, site_name: str) -> bool:
+    """
+    Check if a raw (uncompressed) DMAP frame was recently received for the site
+
+    :Args:
+        raw_data (bytes): The raw DMAP record
+        site_name (str): Name of the radar site
+
+    :Returns:
+        bool: True if the frame is a duplicate and should be dropped
+    """
+    return _check_and_remember(site_name, ("frame", hash(raw_data)))
+
+
+def is_duplicate_record(dmap_dict: dict, site_name: str) -> bool:
+    """
+    Check if a decoded DMAP record with the same station, time, beam and scan was recently received for the site
+
+    :Args:
+        dmap_dict (dict): Dictionary of data as returned from `dmap.read_dmap_bytes()`
+        site_name (str): Name of the radar site
+
+    :Returns:
+        bool: True if the record is a duplicate and should be dropped
+    """
+    try:
+        key = ("record", int(dmap_dict["stid"]), *(int(dmap_dict[f"time.{unit}"]) for unit in ("yr", "mo", "dy", "hr", "mt", "sc", "us")),
+               int(dmap_dict["bmnum"]), int(dmap_dict["scan"]))
+    except KeyError:
+        return False
+
+    return _check_and_remember(site_name, key)
@@ -0,0 +1,139 @@
+"""
+Exports echo counts as typed, compressed columnar files (Parquet or Arrow IPC stream).
+
+The database is read in row groups of `ROW_GROUP_SIZE` rows, and each row group is
+encoded and sent to the client before the next one is read, so server memory stays
+bounded regardless of how many days or sites are requested.
+"""
+import io
+import logging
+import traceback
+from typing import Iterator
+
+from sqlalchemy import select
+
+from ..models import EchoCounts, db
+
+ROW_GROUP_SIZE = 50_000  # Number of rows read from the database and written per row group
+
+EXPORT_FORMATS = {
+    # format: (mimetype, file extension)
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object that buffers written bytes until they are drained."""
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        """Return and clear the bytes written since the last drain."""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _get_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("site_name", pa.dictionary(pa.int32(), pa.string())),
+        ("timestamp", pa.timestamp("ms", tz="UTC")),
+        ("total_echoes", pa.int32()),
+        ("ionospheric_echoes", pa.int32()),
+        ("ground_scatter_echoes", pa.int32()),
+    ])
+
+
+def _echo_counts_filters(site_names: list[str] | None, start_time, end_time) -> list:
+    """The query filters selecting the echo counts of the given sites and time range"""
+    filters = [EchoCounts.timestamp >= start_time, EchoCounts.timestamp <= end_time]
+
+    if site_names is not None:
+        filters.append(EchoCounts.site_name.in_(site_names))
+
+    return filters
+
+
+def has_echo_counts(site_names: list[str] | None, start_time, end_time) -> bool:
+    """Check if any echo counts exist for the given sites and time range, before starting an export"""
+    stmt = select(EchoCounts.id).where(*_echo_counts_filters(site_names, start_time, end_time)).limit(1)
+    return db.session.execute(stmt).first() is not None
+
+
+def _iter_echo_count_tables(site_names: list[str] | None, start_time, end_time, schema) -> Iterator:
+    """Query the echo counts and yield them as `pyarrow.Table`s of at most `ROW_GROUP_SIZE` rows."""
+    import pyarrow as pa
+
+    stmt = select(
+        EchoCounts.site_name,
+        EchoCounts.timestamp,
+        EchoCounts.total_echoes,
+        EchoCounts.ionospheric_echoes,
+        EchoCounts.ground_scatter_echoes,
+    ).where(
+        *_echo_counts_filters(site_names, start_time, end_time)
+    ).order_by(EchoCounts.site_name, EchoCounts.timestamp).execution_options(yield_per=ROW_GROUP_SIZE)
+
+    result = db.session.execute(stmt)
+    for rows in result.partitions():
+        columns = list(zip(*rows))
+        yield pa.Table.from_arrays([
+            pa.array(column, type=field.type.value_type).dictionary_encode()
+            if pa.types.is_dictionary(field.type) else pa.array(column, type=field.type)
+            for column, field in zip(columns, schema)
+        ], schema=schema)
+
+
+def export_echo_counts(site_names: list[str] | None, start_time, end_time, export_format: str) -> Iterator[bytes]:
+    """
+    Stream echo counts for the given sites and time range as a columnar file.
+
+    :Args:
+        site_names (list[str] | None): The radar sites to export, or None for all sites
+        start_time (datetime): Start of the time range
+        end_time (datetime): End of the time range
+        export_format (str): Either "parquet" or "arrow" (Arrow IPC stream), see `EXPORT_FORMATS`
+
+    :Returns:
+        Iterator[bytes]: The file contents, one chunk per row group
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _get_schema()
+    sink = _ChunkSink()
+
+    if export_format == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    elif export_format == "arrow":
+        writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+    else:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    try:
+        with writer:
+            for table in _iter_echo_count_tables(site_names, start_time, end_time, schema):
+                writer.write_table(table)
+                yield sink.drain()
+    except Exception as e:
+        # The response headers have already been sent, so the download is cut off
+        logging.error(f"Error exporting echo counts for {site_names or 'all sites'}:\n{traceback.format_exc()}")
+        raise
+
+    yield sink.drain()
@@ -0,0 +1,197 @@
+"""
+Computes and caches the fan plot geometry (range gate corner coordinates) for a radar.
+
+The geometry only depends on the radar hardware and its operating parameters (frang, rsep, nrang),
+so it is computed once per radar mode, cached and referenced from beam packets by a geometry key.
+The key includes when the hardware parameters took effect, so the geometry of a key never changes.
+Only keys that were sent in a beam packet are served, so clients cannot request arbitrary geometries.
+
+Radar hardware parameters are read from the SuperDARN hardware files (hdw.dat.*, see
+https://github.com/SuperDARN/hdw) in the directory given by the `SD_HDWPATH` environment variable,
+and are reloaded every hour to pick up changes to the files and hardware changes taking effect.
+"""
+import os
+import glob
+import logging
+import datetime as dt
+from collections import OrderedDict
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import orjson
+
+EARTH_RADIUS = 6371.0  # km
+FAN_GEOMETRY_CACHE_SIZE = int(os.getenv('FAN_GEOMETRY_CACHE_SIZE', 256))
+
+# Limits of the operating parameters a geometry is computed for, well beyond those of any radar mode
+MAX_FRANG = 5000  # km
+MAX_RSEP = 300  # km
+MAX_NRANG = 1000
+
+
+class HardwareInfo(NamedTuple):
+    """Radar hardware parameters needed for the fan geometry"""
+    stid: int
+    valid_from: dt.datetime
+    lat: float
+    lon: float
+    boresight: float
+    boresight_shift: float
+    beam_separation: float
+    beams: int
+
+
+# Geometry keys sent in beam packets and the parameters of their geometry, least recently used first
+_geometry_keys = OrderedDict()
+
+
+@lru_cache(maxsize=1)
+def _read_hardware_info(now: dt.datetime) -> dict[int, HardwareInfo]:
+    """Read the hardware parameters of every radar in effect at `now` (UTC) from the hardware files in `SD_HDWPATH`"""
+    hdw_path = os.getenv('SD_HDWPATH')
+    if not hdw_path:
+        logging.warning("SD_HDWPATH is not set, fan geometry is unavailable")
+        return {}
+
+    hardware_info = {}
+
+    for hdw_file in glob.glob(os.path.join(hdw_path, 'hdw.dat.*')):
+        try:
+            with open(hdw_file) as f:
+                for line in f:
+                    values = line.split()
+                    if not values or line.lstrip().startswith('#'):
+                        continue
+
+                    # Lines are in chronological order, so keep the last one that is already in effect
+                    valid_from = dt.datetime.strptime(f"{values[2]} {values[3]}", "%Y%m%d %H:%M:%S").replace(tzinfo=dt.timezone.utc)
+                    if valid_from > now:
+                        break
+
+                    hardware_info[int(values[0])] = HardwareInfo(
+                        stid=int(values[0]),
+                        valid_from=valid_from,
+                        lat=float(values[4]),
+                        lon=float(values[5]),
+                        boresight=float(values[7]),
+                        boresight_shift=float(values[8]),
+                        beam_separation=float(values[9]),
+                        beams=int(values[21])
+                    )
+        except (OSError, ValueError, IndexError) as e:
+            logging.warning(f"Failed to read hardware file '{hdw_file}': {e}")
+
+    return hardware_info
+
+
+def load_hardware_info() -> dict[int, HardwareInfo]:
+    """
+    Get the current hardware parameters of every radar, read from the hardware files at most once an hour
+
+    :Returns:
+        dict[int, HardwareInfo]: Hardware parameters keyed by station ID
+    """
+    now = dt.datetime.now(dt.timezone.utc)
+    return _read_hardware_info(now.replace(minute=0, second=0, microsecond=0))
+
+
+def get_geometry_key(stid: int, frang: int, rsep: int, nrang: int) -> str | None:
+    """
+    Get the key identifying the fan geometry for a radar mode, which can then be served by `get_geometry_params`
+
+    :Returns:
+        str | None: The geometry key, or None if the hardware parameters of the radar are unknown
+        or the operating parameters are out of range
+    """
+    hdw = load_hardware_info().get(stid)
+    if hdw is None or not (0 <= frang <= MAX_FRANG and 0 < rsep <= MAX_RSEP and 0 < nrang <= MAX_NRANG):
+        return None
+
+    geometry_key = f"{stid}-{hdw.valid_from:%Y%m%d%H%M%S}-{frang}-{rsep}-{nrang}"
+
+    _geometry_keys[geometry_key] = (hdw, frang, rsep, nrang)
+    _geometry_keys.move_to_end(geometry_key)
+    if len(_geometry_keys) > FAN_GEOMETRY_CACHE_SIZE:
+        _geometry_keys.popitem(last=False)
+
+    return geometry_key
+
+
+def get_geometry_params(geometry_key: str) -> tuple[HardwareInfo, int, int, int] | None:
+    """
+    Get the parameters of the fan geometry for a key created by `get_geometry_key`
+
+    :Returns:
+        tuple[HardwareInfo, int, int, int] | None: The hardware parameters, frang, rsep and nrang,
+        or None if the key was not recently sent in a beam packet
+    """
+    return _geometry_keys.get(geometry_key)
+
+
+def get_virtual_height(slant_ranges: np.ndarray) -> np.ndarray:
+    """Virtual height (km) of the scatter for each slant range (km), using the standard RST model"""
+    return np.select(
+        [slant_ranges < 150, slant_ranges <= 600, slant_ranges < 800],
+        [slant_ranges / 150 * 115, 115, (slant_ranges - 600) / 200 * (300 - 115) + 115],
+        default=300
+    )
+
+
+def compute_fan_geometry(hdw: HardwareInfo, frang: int, rsep: int, nrang: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the geographic coordinates of the range gate corners of a radar's field of view
+
+    :Args:
+        hdw (HardwareInfo): The radar hardware parameters
+        frang (int): Distance to the first range gate (km)
+        rsep (int): Range gate separation (km)
+        nrang (int): Number of range gates
+
+    :Returns:
+        tuple[np.ndarray, np.ndarray]: Latitudes and longitudes with shape (beams + 1, nrang + 1),
+        where [b, g] is the corner at the left edge of beam b and the near edge of range gate g
+    """
+    beam_edges = np.arange(hdw.beams + 1) - hdw.beams / 2
+    azimuths = np.radians(hdw.boresight + hdw.boresight_shift + beam_edges * hdw.beam_separation)[:, np.newaxis]
+
+    slant_ranges = frang + rsep * np.arange(nrang + 1, dtype=float)
+    scatter_radius = EARTH_RADIUS + get_virtual_height(slant_ranges)
+
+    # Angle at the centre of the earth between the radar and the scatter point (law of cosines)
+    cos_angle = (EARTH_RADIUS ** 2 + scatter_radius ** 2 - slant_ranges ** 2) / (2 * EARTH_RADIUS * scatter_radius)
+    angles = np.arccos(np.clip(cos_angle, -1, 1))[np.newaxis, :]
+
+    # Destination point along the great circle from the radar at each azimuth
+    radar_lat = np.radians(hdw.lat)
+    radar_lon = np.radians(hdw.lon)
+
+    lat = np.arcsin(np.sin(radar_lat) * np.cos(angles) + np.cos(radar_lat) * np.sin(angles) * np.cos(azimuths))
+    lon = radar_lon + np.arctan2(
+        np.sin(azimuths) * np.sin(angles) * np.cos(radar_lat),
+        np.cos(angles) - np.sin(radar_lat) * np.sin(lat)
+    )
+
+    lon = (np.degrees(lon) + 180) % 360 - 180
+    return np.degrees(lat), lon
+
+
+@lru_cache(maxsize=FAN_GEOMETRY_CACHE_SIZE)
+def get_fan_geometry(hdw: HardwareInfo, frang: int, rsep: int, nrang: int) -> bytes:
+    """
+    Get the JSON encoded fan geometry for a radar mode, computed once and cached
+
+    :Returns:
+        bytes: The JSON encoded geometry
+    """
+    lat, lon = compute_fan_geometry(hdw, frang, rsep, nrang)
+
+    return orjson.dumps({
+        "stid": hdw.stid,
+        "frang": frang,
+        "rsep": rsep,
+        "nrang": nrang,
+        "beams": hdw.beams,
+        "lat": np.round(lat, 4),
+        "lon": np.round(lon, 4)
+    }, option=orjson.OPT_SERIALIZE_NUMPY)
@@ -0,0 +1,169 @@
+"""
+Server-side quality filtering of DMAP records before they are converted to JSON packets.
+
+Filters are named presets of parameters (see `FILTER_PARAMETERS`), applied as NumPy boolean
+masks over the `slist`-aligned arrays. The built-in presets can be overridden, and new presets
+added, for all sites or per site in the filter configuration file (`FILTERS_CONFIG_PATH`).
+"""
+import os
+import json
+import logging
+from functools import cache
+
+import numpy as np
+
+FILTERS_CONFIG_PATH = os.getenv('FILTERS_CONFIG_PATH', 'filters.config.json')
+
+# Parameters a filter preset can set, and their type
+FILTER_PARAMETERS = {
+    "min_power": float,  # Minimum lag-0 power (p_l, dB)
+    "max_velocity_error": float,  # Maximum velocity error (v_e, m/s)
+    "remove_ground_scatter": bool,  # Remove echoes flagged as ground scatter (gflg)
+    "min_gate": int,  # First range gate to keep
+    "max_gate": int,  # Last range gate to keep
+}
+
+# JSON types accepted for each parameter type (bool is a subclass of int, so it is checked separately)
+_ACCEPTED_TYPES = {
+    float: (int, float),
+    int: (int,),
+    bool: (bool,),
+}
+
+DEFAULT_FILTER_PRESETS = {
+    "quality": {"min_power": 3.0, "max_velocity_error": 100.0},
+    "ionospheric": {"remove_ground_scatter": True},
+    "quality_ionospheric": {"min_power": 3.0, "max_velocity_error": 100.0, "remove_ground_scatter": True},
+}
+
+# Fields of a DMAP record with one value per echo (aligned with slist)
+SLIST_FIELDS = (
+    "slist", "qflg", "gflg", "p_l", "p_l_e", "p_s", "p_s_e", "v", "v_e", "w_l", "w_l_e", "w_s", "w_s_e",
+    "sd_l", "sd_s", "sd_phi", "x_qflg", "x_gflg", "x_p_l", "x_p_l_e", "x_p_s", "x_p_s_e", "x_v", "x_v_e",
+    "x_w_l", "x_w_l_e", "x_w_s", "x_w_s_e", "phi0", "phi0_e", "elv", "elv_low", "elv_high", "x_sd_l",
+    "x_sd_s", "x_sd_phi",
+)
+
+
+def _parse_presets(presets: dict, source: str) -> dict[str, dict]:
+    """Validate filter presets loaded from the configuration file, dropping unknown parameters and invalid values"""
+    parsed = {}
+    for name, params in presets.items():
+        if not isinstance(params, dict):
+            logging.warning(f"Ignoring filter preset '{name}' ({source}): expected an object of filter parameters")
+            continue
+
+        parsed[name] = {}
+        for param, value in params.items():
+            if param not in FILTER_PARAMETERS:
+                logging.warning(f"Ignoring unknown filter parameter '{param}' in preset '{name}' ({source})")
+                continue
+
+            param_type = FILTER_PARAMETERS[param]
+            if (isinstance(value, bool) and param_type is not bool) or not isinstance(value, _ACCEPTED_TYPES[param_type]):
+                logging.warning(f"Ignoring filter parameter '{param}' in preset '{name}' ({source}): "
+                                f"expected {param_type.__name__}, got {json.dumps(value)}")
+                continue
+
+            parsed[name][param] = param_type(value)
+    return parsed
+
+
+@cache
+def load_filters_config() -> tuple[dict[str, dict], dict[str, dict[str, dict]]]:
+    """
+    Load the filter presets from `FILTERS_CONFIG_PATH`, if it exists
+
+    :Returns:
+        tuple[dict, dict]: A tuple containing:
+            - presets (dict): Filter parameters keyed by preset name, for all sites
+            - site_presets (dict): Filter parameters keyed by site name then preset name
+    """
+    presets = dict(DEFAULT_FILTER_PRESETS)
+    site_presets = {}
+
+    if not os.path.exists(FILTERS_CONFIG_PATH):
+        return presets, site_presets
+
+    try:
+        with open(FILTERS_CONFIG_PATH) as f:
+            filters_config = json.load(f)
+
+        global_presets = filters_config.get("presets", {})
+        if isinstance(global_presets, dict):
+            presets.update(_parse_presets(global_presets, "all sites"))
+        else:
+            logging.warning("Ignoring 'presets' in the filter configuration: expected an object of filter presets")
+
+        sites = filters_config.get("sites", {})
+        if not isinstance(sites, dict):
+            logging.warning("Ignoring 'sites' in the filter configuration: expected an object of filter presets per site")
+            sites = {}
+
+        for site_name, site_config in sites.items():
+            if not isinstance(site_config, dict):
+                logging.warning(f"Ignoring the filter presets of {site_name}: expected an object of filter presets")
+                continue
+            site_presets[site_name] = _parse_presets(site_config, site_name)
+    except Exception as e:
+        logging.error(f"Failed to load filter configuration, using default filter presets:\n{e}")
+        return dict(DEFAULT_FILTER_PRESETS), {}
+
+    return presets, site_presets
+
+
+def get_filter_presets(site_name: str) -> dict[str, dict]:
+    """
+    Get the filter presets available for a site
+
+    :Returns:
+        dict[str, dict]: Filter parameters keyed by preset name
+    """
+    presets, site_presets = load_filters_config()
+    return {**presets, **site_presets.get(site_name, {})}
+
+
+def _get_slist_field(dmap_dict: dict, field: str, length: int) -> np.ndarray | None:
+    """A field of the DMAP record with one value per echo, or None if it is missing or not aligned with slist"""
+    if field not in dmap_dict or len(dmap_dict[field]) != length:
+        return None
+    return np.asarray(dmap_dict[field])
+
+
+def filter_dmap(dmap_dict: dict, params: dict) -> dict:
+    """
+    Remove the echoes that do not pass a filter from a DMAP record
+
+    :Args:
+        dmap_dict (dict): Dictionary of data as returned from `dmap.read_dmap_bytes()`
+        params (dict): The filter parameters (see `FILTER_PARAMETERS`)
+
+    :Returns:
+        dict: A copy of the DMAP record with only the echoes that passed the filter
+    """
+    if "slist" not in dmap_dict:
+        return dmap_dict
+
+    slist = np.asarray(dmap_dict["slist"])
+    mask = np.ones(len(slist), dtype=bool)
+
+    p_l, v_e, gflg = (_get_slist_field(dmap_dict, field, len(slist)) for field in ("p_l", "v_e", "gflg"))
+
+    if "min_power" in params and p_l is not None:
+        mask &= p_l >= params["min_power"]
+    if "max_velocity_error" in params and v_e is not None:
+        mask &= v_e <= params["max_velocity_error"]
+    if params.get("remove_ground_scatter") and gflg is not None:
+        mask &= gflg == 0
+    if "min_gate" in params:
+        mask &= slist >= params["min_gate"]
+    if "max_gate" in params:
+        mask &= slist <= params["max_gate"]
+
+    filtered = dict(dmap_dict)
+    for field in SLIST_FIELDS:
+        values = _get_slist_field(dmap_dict, field, len(slist))
+        if values is not None:
+            filtered[field] = values[mask]
+
+    return filtered
@@ -0,0 +1,128 @@
+"""
+Aggregates the latest state of every radar into one compact network frame for overview displays.
+
+The latest completed scan and echo counts of each site are kept as records are received, and
+`build_network_frame()` combines them into a single frame with per-site staleness markers,
+so overview clients receive one message per interval instead of every beam of every radar.
+Configured sites that have not sent any data are included as stale, so they can be shown as offline.
+"""
+import os
+import datetime as dt
+
+import numpy as np
+
+from .fan_geometry import get_geometry_key
+from .process_dmap import format_dmap_date
+
+NETWORK_FRAME_INTERVAL = float(os.getenv('NETWORK_FRAME_INTERVAL', 60))  # seconds between network frames
+NETWORK_STALE_AFTER = float(os.getenv('NETWORK_STALE_AFTER', 300))  # seconds without data before a site is stale
+
+# Latest state of each site, keyed by site name
+network_state = {}
+
+# Sites in the radar configuration, which are in the frame (as stale) even before they send data
+configured_sites = set()
+
+
+def _get_site_state(site_name: str) -> dict:
+    return network_state.setdefault(site_name, {
+        'last_received': None,
+        'current_scan': None,
+        'completed_scan': None,
+        'echoes': None
+    })
+
+
+def set_configured_sites(site_names):
+    """
+    Set the sites in the radar configuration. New sites are added to the frame with no data,
+    and sites removed from the configuration are dropped from it.
+
+    :Args:
+        site_names (Iterable[str]): Names of the configured radar sites
+    """
+    site_names = set(site_names)
+
+    for site_name in configured_sites - site_names:
+        network_state.pop(site_name, None)
+
+    configured_sites.clear()
+    configured_sites.update(site_names)
+
+    for site_name in site_names:
+        _get_site_state(site_name)
+
+
+def update_network_scan(dmap_dict: dict, site_name: str):
+    """
+    Add a beam to the scan in progress for the site. When a new scan starts, the scan in
+    progress becomes the site's latest completed scan.
+
+    :Args:
+        dmap_dict (dict): Dictionary of data as returned from `dmap.read_dmap_bytes()`
+        site_name (str): Name of the radar site
+    """
+    state = _get_site_state(site_name)
+    state['last_received'] = dt.datetime.now(dt.timezone.utc)
+
+    if dmap_dict.get("scan") == 1 and state['current_scan']:
+        state['completed_scan'] = state['current_scan']
+        state['current_scan'] = None
+
+    time = format_dmap_date(dmap_dict)
+    stid, frang, rsep, nrang = (int(dmap_dict[key]) for key in ("stid", "frang", "rsep", "nrang"))
+
+    if state['current_scan'] is None:
+        state['current_scan'] = {
+            "stid": stid,
+            "time": time,
+            "nrang": nrang,
+            "geometry": get_geometry_key(stid, frang, rsep, nrang),
+            "beams": {}
+        }
+
+    # Only the echoes are kept (rather than arrays of nrang values) to keep the frame compact
+    has_echoes = all(key in dmap_dict for key in ("slist", "v", "p_l", "gflg"))
+    state['current_scan']["beams"][int(dmap_dict["bmnum"])] = {
+        "beam": int(dmap_dict["bmnum"]),
+        "time": time,
+        "gates": np.asarray(dmap_dict["slist"]) if has_echoes else [],
+        "velocity": np.round(dmap_dict["v"], 1) if has_echoes else [],
+        "power": np.round(dmap_dict["p_l"], 1) if has_echoes else [],
+        "g_scatter": np.asarray(dmap_dict["gflg"]) if has_echoes else []
+    }
+
+
+def update_network_echo_counts(echo_counts: dict, site_name: str):
+    """Set the latest echo counts (as sent on the `{site_name}/echoes` event) for the site"""
+    _get_site_state(site_name)['echoes'] = echo_counts
+
+
+def build_network_frame() -> dict:
+    """
+    Build a network frame from the latest state of every site
+
+    :Returns:
+        dict: The network frame. Each site has its latest completed scan (with beams sorted by
+        beam number), latest echo counts, when data was last received and whether it is stale.
+    """
+    now = dt.datetime.now(dt.timezone.utc)
+    sites = {}
+
+    for site_name, state in network_state.items():
+        age = (now - state['last_received']).total_seconds() if state['last_received'] else None
+        scan = state['completed_scan']
+
+        sites[site_name] = {
+            "last_received": state['last_received'].isoformat() if state['last_received'] else None,
+            "age": round(age, 1) if age is not None else None,
+            "stale": age is None or age > NETWORK_STALE_AFTER,
+            "scan": {**scan, "beams": [scan["beams"][beam] for beam in sorted(scan["beams"])]} if scan else None,
+            "echoes": state['echoes']
+        }
+
+    return {
+        "time": now.isoformat(),
+        "interval": NETWORK_FRAME_INTERVAL,
+        "sites": sites
+    }
@@ -3,6 +3,7 @@ Proccesses DMAP as JSON packets for the frontend.
 """
 import datetime as dt
 import logging
+from .fan_geometry import get_geometry_key
 
 def dmap_to_json(dmap_dict: dict, site_name: str) -> dict:
     """
@@ -69,6 +70,7 @@ def dmap_to_json(dmap_dict: dict, site_name: str) -> dict:
         "nrang": nrang,
         "rsep": int(dmap_dict["rsep"]),
         "stid": int(dmap_dict["stid"]),
+        "geometry": get_geometry_key(int(dmap_dict["stid"]), int(dmap_dict["frang"]), int(dmap_dict["rsep"]), nrang),
         "scan": int(dmap_dict["scan"]),
         "gflg": dmap_dict["gflg"].tolist(),
         "v": dmap_dict["v"].tolist(),
@@ -1,6 +1,5 @@
 import logging
 import datetime as dt
-import pandas as pd
 from collections import defaultdict
 
 from ..models import EchoCounts, db
@@ -72,22 +71,52 @@ def get_echo_counts(site_name: str, start_time, end_time) -> dict[str, list]:
     Retrieve echo counts for a specific site within a time range,
     and return as a dictionary of lists (column-oriented), excluding id and site_name.
     """
-    # Query the database
-    query = EchoCounts.query.filter(
-        EchoCounts.site_name == site_name,
-        EchoCounts.timestamp >= start_time,
-        EchoCounts.timestamp <= end_time
-    ).order_by(EchoCounts.timestamp)
+    return get_echo_counts_for_sites([site_name], start_time, end_time).get(site_name, {})
 
-    # Convert to DataFrame
-    data = [c.to_dict() for c in query.all()]
-    if not data:
-        return {}
+def get_echo_counts_for_sites(site_names: list[str] | None, start_time, end_time) -> dict[str, dict[str, list]]:
+    """
+    Retrieve echo counts for several sites within a time range using a single query.
+
+    :Args:
+        site_names (list[str] | None): The sites to retrieve, or None for all sites
+        start_time (datetime): Start of the time range
+        end_time (datetime): End of the time range
 
-    df = pd.DataFrame(data)
-    # Drop 'id' and 'site_name' columns if they exist
-    df = df.drop(columns=[col for col in ['id', 'site_name'] if col in df.columns])
-    return df.to_dict(orient='list')
+    :Returns:
+        dict[str, dict[str, list]]: Column-oriented echo counts (as returned by `get_echo_counts`)
+        keyed by site name. Sites without echo counts in the time range are omitted.
+    """
+    query = db.session.query(
+        EchoCounts.site_name,
+        EchoCounts.timestamp,
+        EchoCounts.total_echoes,
+        EchoCounts.ionospheric_echoes,
+        EchoCounts.ground_scatter_echoes
+    ).filter(
+        EchoCounts.timestamp >= start_time,
+        EchoCounts.timestamp <= end_time
+    )
+
+    if site_names is not None:
+        query = query.filter(EchoCounts.site_name.in_(site_names))
+
+    echo_counts = {}
+    for site_name, timestamp, total, iono, ground_scatter in query.order_by(EchoCounts.site_name, EchoCounts.timestamp):
+        columns = echo_counts.get(site_name)
+        if columns is None:
+            columns = echo_counts[site_name] = {
+                "timestamp": [],
+                "total_echoes": [],
+                "ionospheric_echoes": [],
+                "ground_scatter_echoes": []
+            }
+
+        columns["timestamp"].append(timestamp.isoformat() if timestamp else timestamp)
+        columns["total_echoes"].append(total)
+        columns["ionospheric_echoes"].append(iono)
+        columns["ground_scatter_echoes"].append(ground_scatter)
+
+    return echo_counts
 
 def get_num_echoes(dmap_dict: dict) -> tuple[int, int, int]:
     """
@@ -0,0 +1,69 @@
+"""
+Fast JSON encoding for Socket.IO packets.
+
+Packets are encoded once with orjson by `encode_packet()`, which returns a pre-encoded
+fragment. This module is also used as the Socket.IO JSON module, so emitting a
+fragment only copies the already encoded bytes into the Socket.IO frame instead of
+encoding the packet again, no matter how many clients or rooms it is sent to.
+
+WebSocket compression (permessage-deflate) is not pre-computed. eventlet compresses each
+message in the connection's own send path with a per-connection compressor that, unless
+no_context_takeover was negotiated, depends on the messages previously sent on that
+connection, and Engine.IO passes it text with no way to supply already compressed bytes.
+So compressed frames cannot be shared between connections, and compression still costs
+CPU once per message per connection.
+"""
+from collections import Counter
+
+import orjson
+from socketio.packet import BINARY_EVENT, EVENT, Packet
+
+# Number of times a packet has been JSON encoded by `encode_packet`, per site. Should match the number
+# of packets received from each site times the number of distinct payloads (e.g. projections) sent.
+encode_counts = Counter()
+
+# Number of Socket.IO event packets encoded by `EventCountingPacket`, per event. Socket.IO encodes each
+# emit once for all of its recipients, so this counts emits (not recipients), and pre-encoded packets
+# are only copied. Ack packets (the return values of event handlers) are not counted.
+socketio_encode_counts = Counter()
+
+
+def encode_packet(packet: dict, site_name: str) -> orjson.Fragment:
+    """
+    Encode a packet as JSON once so it can be emitted to any number of clients
+
+    :Args:
+        packet (dict): The packet to encode
+        site_name (str): Name of the radar site the packet belongs to
+
+    :Returns:
+        orjson.Fragment: The pre-encoded packet, which can be passed directly to `socketio.emit`
+    """
+    encode_counts[site_name] += 1
+    return encode_json(packet)
+
+
+def encode_json(obj) -> orjson.Fragment:
+    """Encode an object (e.g. a network frame, which does not belong to a site) as a pre-encoded fragment, without counting it"""
+    return orjson.Fragment(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY))
+
+
+class EventCountingPacket(Packet):
+    """Socket.IO packet that counts the event packets it encodes in `socketio_encode_counts`"""
+
+    def encode(self):
+        # Event packets carry [event, *args]
+        if self.packet_type in (EVENT, BINARY_EVENT):
+            socketio_encode_counts[self.data[0]] += 1
+
+        return super().encode()
+
+
+def dumps(obj, **kwargs) -> str:
+    """Drop-in replacement for `json.dumps` used by Socket.IO (keyword arguments are ignored)"""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+
+
+def loads(s, **kwargs):
+    """Drop-in replacement for `json.loads` used by Socket.IO (keyword arguments are ignored)"""
+    return orjson.loads(s)
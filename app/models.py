@@ -3,6 +3,11 @@ from app import db
 from datetime import datetime
 
 class EchoCounts(db.Model):
+    # Echo counts are always queried by site(s) and time range
+    __table_args__ = (
+        db.Index('ix_echo_counts_site_name_timestamp', 'site_name', 'timestamp'),
+    )
+
     id: Mapped[int] = mapped_column(primary_key=True)
     site_name: Mapped[str] = mapped_column()
     timestamp: Mapped[datetime] = mapped_column(
@@ -38,11 +38,37 @@ def receive_zmq_socket_msg(socket):
             - data (dict): Dictionary of data as returned from dmap.read_dmap_bytes()
             - site_name (str): Name of radar site
     """
+    raw_data, site_name = receive_zmq_socket_raw_msg(socket)
+    return decode_zmq_dmap(raw_data), site_name
+
+def receive_zmq_socket_raw_msg(socket):
+    """
+    Receives message from a ZMQ socket without decoding the dmap record
+
+    :Args:
+        socket (zmq.Socket): The socket returned from `connect_to_zmq_socket`
+    
+    :Returns: 
+        tuple[bytes, str]: A tuple containing:
+            - raw_data (bytes): The decompressed (raw) dmap record
+            - site_name (str): Name of radar site
+    """
     try:
         msg = socket.recv_multipart(copy=True) 
         site_name, compressed_bytes = msg
     except ValueError:
         raise ValueError(f"Unexpected message: {msg}")
 
-    decompressed_msg = zlib.decompress(compressed_bytes)
-    return dmap.read_dmap_bytes(decompressed_msg)[0], site_name.decode('utf-8')  # should be list[bytes] of 1 record
\ No newline at end of file
+    return zlib.decompress(compressed_bytes), site_name.decode('utf-8')
+
+def decode_zmq_dmap(raw_data: bytes) -> dict:
+    """
+    Decodes a raw dmap record received from a ZMQ socket
+
+    :Args:
+        raw_data (bytes): The decompressed dmap record
+
+    :Returns:
+        dict: Dictionary of data as returned from dmap.read_dmap_bytes()
+    """
+    return dmap.read_dmap_bytes(raw_data)[0]  # should be list[bytes] of 1 record
\ No newline at end of file
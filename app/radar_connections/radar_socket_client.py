@@ -29,11 +29,29 @@ class RadarSocketClient:
         self.timeout = timeout
         # Keep track of invalid packets received
         self._invalid_packet_count = 0
+        # Set once the client is closed, so it does not reconnect
+        self._closed = False
 
     def __del__(self):
         """Ensures the client socket is closed when the object is deleted."""
+        self.close()
+
+    def close(self):
+        """Closes the connection to the radar server. The client will not reconnect after being closed."""
+        self._closed = True
         self.client_socket.close()
 
+    def shutdown(self):
+        """
+        Shuts down the connection to the radar server from another thread, waking up a pending
+        receive (which then returns None). The client will not reconnect after being shut down.
+        """
+        self._closed = True
+        try:
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # Not connected
+
     def receive_data(self) -> dict | None:
         """
         Receives and processes data packets from the radar server.
@@ -41,6 +59,20 @@ class RadarSocketClient:
         :Returns:
             dict | None: Returns the dmap data as a dictionary if successful, otherwise None.
         """
+        raw_data = self.receive_raw_data()
+
+        if not raw_data:
+            return None
+
+        return read_dmap_record(raw_data)
+
+    def receive_raw_data(self) -> bytes | None:
+        """
+        Receives a data packet from the radar server without decoding it.
+
+        :Returns:
+            bytes | None: Returns the raw dmap record if successful, otherwise None.
+        """
         if self._invalid_packet_count > 10:
             logging.warning(f"Too many invalid packets received from {self.host}:{self.port}, reconnecting...")
             self.reconnect()
@@ -76,15 +108,12 @@ class RadarSocketClient:
             logging.debug("Invalid data length of {0}".format(block_size))
             return None
 
-        raw_data = read_data_block(self.client_socket, block_size)
-
-        try:
-            return dmap.read_dmap_bytes(raw_data)[0]
-        except Exception as e:
-            logging.error(f"Error reading dmap data:\n{traceback.format_exc()}")
-            return None
+        return read_data_block(self.client_socket, block_size)
 
     def reconnect(self):
+        if self._closed:
+            return
+
         try:
             self.client_socket.close()
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -94,6 +123,22 @@ class RadarSocketClient:
             logging.error(f"Failed to reconnect to {self.host}:{self.port}:\n{traceback.format_exc()}")
         
 
+def read_dmap_record(raw_data: bytes) -> dict | None:
+    """
+    Decodes a raw dmap record.
+
+    :Args:
+        raw_data (bytes): The raw dmap record.
+
+    :Returns:
+        dict | None: Returns the dmap data as a dictionary if successful, otherwise None.
+    """
+    try:
+        return dmap.read_dmap_bytes(raw_data)[0]
+    except Exception as e:
+        logging.error(f"Error reading dmap data:\n{traceback.format_exc()}")
+        return None
+
 def verify_packet_encoding(packet: bytes) -> bool:
     """
     Verifies if a packet received from a socket is a dmap file based on the
@@ -1,23 +1,34 @@
 import io
+import os
 import csv
+import hmac
 import logging
 import traceback
 from dateutil.parser import parse
-from flask import Blueprint, request, jsonify, make_response
+from werkzeug.utils import secure_filename
+from flask import Blueprint, Response, request, jsonify, make_response, current_app, stream_with_context
 from datetime import datetime, timedelta, timezone
-from .data_processing.process_echoes import get_echo_counts
+from .data_processing.process_echoes import get_echo_counts, get_echo_counts_for_sites
+from .data_processing.export_echoes import EXPORT_FORMATS, export_echo_counts, has_echo_counts
+from .data_processing.fan_geometry import get_fan_geometry, get_geometry_params
+from .socket_server import reload_radars_config
 
 bp = Blueprint('main', __name__)
 
 @bp.route('/echoes')
 def echoes():
-    site_name = request.args.get('site_name')
+    site_name_strs = request.args.getlist('site_name')
     start_str = request.args.get('start')
     end_str = request.args.get('end')
     do_save_str = request.args.get('save')
+    export_format = request.args.get('format', 'json').lower()
 
-    if not site_name:
+    site_names = get_site_names(site_name_strs)
+    if site_names == []:
         return jsonify({"message": "Missing required parameter: site_name"}), 400
+
+    if export_format not in ('json', 'csv', *EXPORT_FORMATS):
+        return jsonify({"message": f"Invalid format. Must be one of: json, csv, {', '.join(EXPORT_FORMATS)}"}), 400
     
     try:
         start_time = parse(start_str) if start_str else None
@@ -33,19 +44,39 @@ def echoes():
     if not start_time:
         start_time = end_time - timedelta(hours=24)
 
+    if export_format in EXPORT_FORMATS:
+        try:
+            if not has_echo_counts(site_names, start_time, end_time):
+                return jsonify({"message": "No echoes found for the specified date range."}), 404
+        except Exception as e:
+            logging.error(f"Error fetching echo counts for {site_names or 'all sites'}:\n{traceback.format_exc()}")
+            return jsonify({"message": "Error fetching echo counts.", "error": str(e)}), 500
+
+        return export_echo_counts_response(site_names, start_time, end_time, export_format)
+
+    # A single site keeps the single-site response shape, otherwise the response is keyed by site name
+    is_single_site = site_names is not None and len(site_names) == 1
+
     try:
-        echo_counts = get_echo_counts(site_name, start_time, end_time)
+        if is_single_site:
+            echo_counts = get_echo_counts(site_names[0], start_time, end_time)
+        else:
+            echo_counts = get_echo_counts_for_sites(site_names, start_time, end_time)
     except Exception as e:
-        logging.error(f"Error fetching echo counts for {site_name}:\n{traceback.format_exc()}")
+        logging.error(f"Error fetching echo counts for {site_names or 'all sites'}:\n{traceback.format_exc()}")
         return jsonify({"message": "Error fetching echo counts.", "error": str(e)}), 500
 
     if not echo_counts:
         return jsonify({"message": "No echoes found for the specified date range."}), 404
 
     do_save = do_save_str.lower() == 'true' if do_save_str else False
+    do_save = do_save or export_format == 'csv'
 
     if do_save:
-        echoes_csv = convert_echo_counts_to_csv(echo_counts)
+        if is_single_site:
+            echoes_csv = convert_echo_counts_to_csv(echo_counts)
+        else:
+            echoes_csv = convert_site_echo_counts_to_csv(echo_counts)
         response = make_response(echoes_csv)
 
         # Set headers for CSV download
@@ -56,6 +87,69 @@ def echoes():
 
     return echo_counts
 
+def get_site_names(site_name_strs: list[str]) -> list[str] | None:
+    """
+    Parse the (possibly repeated) comma separated `site_name` parameters into a list of site names.
+    Returns None if all sites were requested with `site_name=*`
+    """
+    site_names = []
+    for site_name_str in site_name_strs:
+        for name in site_name_str.split(','):
+            name = name.strip()
+            if name == '*':
+                return None
+            if name and name not in site_names:
+                site_names.append(name)
+
+    return site_names
+
+def export_echo_counts_response(site_names: list[str] | None, start_time, end_time, export_format: str):
+    """Stream echo counts as a columnar file download (see `EXPORT_FORMATS`)"""
+    mimetype, extension = EXPORT_FORMATS[export_format]
+    filename = secure_filename(f"{'_'.join(site_names) if site_names else 'all'}_echoes.{extension}") or f"echoes.{extension}"
+
+    response = Response(
+        stream_with_context(export_echo_counts(site_names, start_time, end_time, export_format)),
+        mimetype=mimetype
+    )
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    return response
+
+@bp.route('/geometry/<geometry_key>')
+def geometry(geometry_key):
+    """Fan plot geometry (range gate corner coordinates) for the `geometry` key of a beam packet"""
+    geometry_params = get_geometry_params(geometry_key)
+    if geometry_params is None:
+        return jsonify({"message": f"Unknown geometry key: {geometry_key}. Use the `geometry` key of a recent beam packet."}), 404
+
+    fan_geometry = get_fan_geometry(*geometry_params)
+
+    response = make_response(fan_geometry)
+    response.headers["Content-Type"] = "application/json"
+    # The key includes when the hardware parameters took effect, so the geometry for a key never changes
+    response.headers["Cache-Control"] = "public, max-age=604800"
+
+    return response
+
+@bp.route('/admin/reload-radars', methods=['POST'])
+def reload_radars():
+    """Reload radars.config.json, restarting only the listeners whose configuration changed."""
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if not admin_token:
+        return jsonify({"message": "Admin endpoints are disabled. Set ADMIN_TOKEN to enable them."}), 403
+
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+        return jsonify({"message": "Invalid admin token."}), 401
+
+    socketio = current_app.extensions['socketio']
+    changes = reload_radars_config(socketio, current_app._get_current_object())
+
+    if changes is None:
+        return jsonify({"message": "Failed to load radar configuration."}), 500
+
+    return jsonify(changes)
+
 def convert_echo_counts_to_csv(echo_counts):
     import io
     import csv
@@ -75,4 +169,16 @@ def convert_echo_counts_to_csv(echo_counts):
         writer.writerow(row)
 
     output.seek(0)
-    return output.getvalue()
\ No newline at end of file
+    return output.getvalue()
+
+def convert_site_echo_counts_to_csv(echo_counts_by_site):
+    """Convert echo counts keyed by site name (see `get_echo_counts_for_sites`) to CSV with a site_name column"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["site_name", "timestamp", "total_echoes", "ionospheric_echoes", "ground_scatter_echoes"])
+
+    for site_name, echo_counts in echo_counts_by_site.items():
+        for row in zip(echo_counts["timestamp"], echo_counts["total_echoes"], echo_counts["ionospheric_echoes"], echo_counts["ground_scatter_echoes"]):
+            writer.writerow([site_name, *row])
+
+    return output.getvalue()
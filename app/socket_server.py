@@ -6,26 +6,68 @@ import logging
 import os
 import json
 import zmq
+import threading
 import traceback
 import datetime as dt
 from .data_processing.process_dmap import dmap_to_json
-from .radar_connections.canada_zmq_connections import connect_to_zmq_socket, receive_zmq_socket_msg
-from .radar_connections.radar_socket_client import RadarSocketClient
+from .radar_connections.canada_zmq_connections import connect_to_zmq_socket, receive_zmq_socket_raw_msg, decode_zmq_dmap
+from .radar_connections.radar_socket_client import RadarSocketClient, read_dmap_record
+from .data_processing.deduplicate import is_duplicate_frame, is_duplicate_record
+from .data_processing.filter_dmap import filter_dmap, get_filter_presets
+from .data_processing.network_frame import NETWORK_FRAME_INTERVAL, build_network_frame, set_configured_sites, update_network_echo_counts, update_network_scan
 from .data_processing.process_echoes import write_echo_counts
+from .json_encoding import encode_json, encode_packet
+from .subscriptions import NETWORK_ROOM, add_known_site, get_full_packet_room, get_projection_room, get_projections, project_packet
+
+
+# Path to the radar configuration file, watched for changes while the server runs
+RADARS_CONFIG_PATH = os.getenv('RADARS_CONFIG_PATH', 'radars.config.json')
+
+# Running radar listeners keyed by site name. Each entry holds the (host, port) the
+# listener was started with, the event used to stop it and its client once connected.
+radar_listeners = {}
 
 
 def start_socketio_listeners(socketio, app):
-    """Starts the radar listeners for each configured radar."""
+    """
+    Schedules the radar listeners to start once the server is accepting connections.
+
+    Background tasks only run once the main thread yields to the event loop, which
+    happens when the server starts accepting connections, so radar connections never
+    delay startup.
+    """
+    socketio.start_background_task(_start_listeners, socketio, app)
+
+
+def _start_listeners(socketio, app):
+    """Starts the radar listeners for each configured radar, the config watcher and the ZMQ listener."""
     logging.info("Starting radar listeners...")
 
-    # Load the radar configuration from radars.config.json
+    reload_radars_config(socketio, app)
+    socketio.start_background_task(watch_radars_config, socketio, app)
+
+    # Start the ZMQ listener for Canada radars
+    socketio.start_background_task(zmq_listener, socketio, app)
+
+    socketio.start_background_task(network_frame_emitter, socketio)
+
+
+def load_radars_config() -> dict | None:
+    """
+    Load the radar configuration from `RADARS_CONFIG_PATH`
+
+    :Returns:
+        dict | None: Mapping of site name to (host, port), or None if the configuration could not be loaded
+    """
     try:
-        radars_config = json.load(open('radars.config.json'))
+        with open(RADARS_CONFIG_PATH) as f:
+            radars_config = json.load(f)
     except Exception as e:
         logging.error(
             f"Failed to load radar configuration:\n{traceback.format_exc()}")
-        return
+        return None
 
+    radars = {}
     for site_name, config in radars_config.items():
         host = config.get('host')
         port = config.get('port')
@@ -35,15 +77,106 @@ def start_socketio_listeners(socketio, app):
                 f"Skipping {site_name}, missing host or port in configuration.")
             continue
 
+        radars[site_name] = (host, port)
+
+    return radars
+
+
+def reload_radars_config(socketio, app) -> dict[str, list[str]] | None:
+    """
+    Diff the radar configuration against the running listeners and start, stop or
+    reconnect only the affected listeners.
+
+    :Returns:
+        dict[str, list[str]] | None: The sites that were started, stopped and reconnected,
+        or None if the configuration could not be loaded
+    """
+    radars = load_radars_config()
+    if radars is None:
+        return None
+
+    set_configured_sites(radars)
+
+    changes = {"started": [], "stopped": [], "reconnected": []}
+
+    for site_name in list(radar_listeners):
+        if site_name not in radars:
+            stop_radar_listener(site_name)
+            changes["stopped"].append(site_name)
+
+    for site_name, (host, port) in radars.items():
+        listener = radar_listeners.get(site_name)
+
+        if listener is None:
+            changes["started"].append(site_name)
+        elif listener["address"] != (host, port):
+            stop_radar_listener(site_name)
+            changes["reconnected"].append(site_name)
+        else:
+            continue
+
+        stop_event = threading.Event()
+        radar_listeners[site_name] = {"address": (host, port), "stop_event": stop_event, "client": None}
         socketio.start_background_task(
-            radar_listener, socketio, app, host, port, site_name)
+            radar_listener, socketio, app, host, port, site_name, stop_event)
 
-    # Start the ZMQ listener for Canada radars
-    socketio.start_background_task(zmq_listener, socketio, app)
+    if any(changes.values()):
+        logging.info(f"Reloaded radar configuration: {changes}")
+
+    return changes
+
+
+def stop_radar_listener(site_name: str):
+    """Signal the listener for `site_name` to disconnect and exit."""
+    listener = radar_listeners.pop(site_name, None)
+    if listener:
+        listener["stop_event"].set()
+        # Wake up a pending receive and stop the client from reconnecting
+        if listener["client"]:
+            listener["client"].shutdown()
+        logging.info(f"Stopping listener for {site_name}")
+
+
+def watch_radars_config(socketio, app):
+    """Polls the radar configuration file and reloads the listeners when it changes."""
+    interval = float(os.getenv('RADARS_CONFIG_POLL_INTERVAL', 5))
+    last_mtime = _get_config_mtime()
+
+    while True:
+        eventlet.sleep(interval)
+
+        mtime = _get_config_mtime()
+        if mtime is None or mtime == last_mtime:
+            continue
+
+        last_mtime = mtime
+        logging.info(f"Detected change in {RADARS_CONFIG_PATH}, reloading radar listeners...")
+        try:
+            reload_radars_config(socketio, app)
+        except Exception as e:
+            logging.error(f"Failed to reload radar configuration:\n{traceback.format_exc()}")
+
+
+def _get_config_mtime() -> float | None:
+    try:
+        return os.stat(RADARS_CONFIG_PATH).st_mtime
+    except OSError:
+        return None
+
+
+def radar_listener(socketio, app, host, port, site_name, stop_event):
+    """Listens for data from a SuperDARN radar client and sends JSON packets until `stop_event` is set."""
+    try:
+        _listen_to_radar(socketio, app, host, port, site_name, stop_event)
+    finally:
+        # Forget the listener once it exits (e.g. failed to connect), so the next reload starts it again.
+        # A reload may already have replaced it with a new listener, which must be kept.
+        listener = radar_listeners.get(site_name)
+        if listener and listener["stop_event"] is stop_event:
+            del radar_listeners[site_name]
 
 
-def radar_listener(socketio, app, host, port, site_name):
-    """Listens for data from a SuperDARN radar client and sends JSON packets."""
+def _listen_to_radar(socketio, app, host, port, site_name, stop_event):
     try:
         client = RadarSocketClient(host, port)
         logging.info(f"Connected to {site_name} at {host}:{port}")
@@ -52,9 +185,24 @@ def radar_listener(socketio, app, host, port, site_name):
             f"Failed to connect to {site_name} at '{host}:{port}':\n{traceback.format_exc()}")
         return
 
-    while True:
+    listener = radar_listeners.get(site_name)
+    if stop_event.is_set() or not listener or listener["stop_event"] is not stop_event:
+        client.close()
+        return
+    listener["client"] = client
+
+    while not stop_event.is_set():
         try:
-            dmap_data = client.receive_data()
+            raw_data = client.receive_raw_data()
+
+            if stop_event.is_set():
+                break
+
+            # Drop resent frames before decoding them
+            if raw_data and is_duplicate_frame(raw_data, site_name):
+                continue
+
+            dmap_data = read_dmap_record(raw_data) if raw_data else None
 
             if dmap_data:
                 with app.app_context():
@@ -66,6 +214,9 @@ def radar_listener(socketio, app, host, port, site_name):
                 f"Error receiving data from {site_name} at '{host}:{port}':\n{traceback.format_exc()}")
             eventlet.sleep(0.1)
 
+    client.close()
+    logging.info(f"Disconnected from {site_name} at {host}:{port}")
+
 
 def zmq_listener(socketio, app):
     """Listens for data from SuperDARN Canada radar sockets using ZMQ."""
@@ -79,7 +230,13 @@ def zmq_listener(socketio, app):
             socks = dict(poller.poll(timeout=1000))  # timeout in milliseconds
 
             if socket in socks:
-                ca_dmap, ca_site_name = receive_zmq_socket_msg(socket)
+                ca_raw_data, ca_site_name = receive_zmq_socket_raw_msg(socket)
+
+                # Drop resent frames before decoding them
+                if is_duplicate_frame(ca_raw_data, ca_site_name):
+                    continue
+
+                ca_dmap = decode_zmq_dmap(ca_raw_data)
                 if ca_dmap:
                     with app.app_context():
                         send_data(socketio, ca_dmap, ca_site_name)
@@ -92,9 +249,18 @@ def zmq_listener(socketio, app):
 
 def send_data(socketio, dmap_dict: dict, site_name: str):
     """Send all radar data to connected clients."""
+    # The same record can be received from more than one source (e.g. TCP and ZMQ)
+    if is_duplicate_record(dmap_dict, site_name):
+        return
+
     send_json_packets(socketio, dmap_dict, site_name)
     send_and_write_echo_counts(socketio, dmap_dict, site_name)
 
+    try:
+        update_network_scan(dmap_dict, site_name)
+    except KeyError as k:
+        logging.debug(f"Failed to update network state for {site_name}, missing data field: {k}")
+
 
 def send_and_write_echo_counts(socketio, dmap_dict: dict, site_name: str):
     """Send echo counts (if a complete scan) and write to database"""
@@ -102,9 +268,10 @@ def send_and_write_echo_counts(socketio, dmap_dict: dict, site_name: str):
 
     if echo_counts:
         timestamp = dt.datetime.now(dt.timezone.utc).isoformat()
+        echoes = {"total_echoes": echo_counts[0], "ionospheric_echoes": echo_counts[1], "ground_scatter_echoes": echo_counts[2], "timestamp": timestamp}
+        update_network_echo_counts(echoes, site_name)
         try:
-            socketio.emit(f"{site_name}/echoes", {
-                "total_echoes": echo_counts[0], "ionospheric_echoes": echo_counts[1], "ground_scatter_echoes": echo_counts[2], "timestamp": timestamp})
+            socketio.emit(f"{site_name}/echoes", echoes)
             logging.info(f"Successfully sent echoes for {site_name}")
         except Exception as e:
             logging.error(
@@ -112,10 +279,47 @@ def send_and_write_echo_counts(socketio, dmap_dict: dict, site_name: str):
 
 
 def send_json_packets(socketio, dmap_data: dict, site_name: str):
-    """Sends JSON packets to connected clients."""
+    """
+    Sends JSON packets to connected clients. Clients subscribed to a filter and/or subset of the fields
+    receive one packet per projection (see subscriptions.py), all others receive the full packet.
+    """
     try:
-        socketio.emit(site_name, dmap_to_json(dmap_data, site_name))
+        packet = dmap_to_json(dmap_data, site_name)
+
+        add_known_site(socketio, site_name)
+        socketio.emit(site_name, encode_packet(packet, site_name), to=get_full_packet_room(site_name))
+
+        # Each filter is applied once, no matter how many projections use it
+        filtered_packets = {None: packet}
+        filter_presets = get_filter_presets(site_name)
+
+        for projection in get_projections(site_name):
+            # A projection that fails is skipped, so it never stops the other packets, echo counts and network state
+            try:
+                if projection.filter_name not in filtered_packets:
+                    filtered_dmap = filter_dmap(dmap_data, filter_presets[projection.filter_name])
+                    filtered_packets[projection.filter_name] = dmap_to_json(filtered_dmap, site_name)
+
+                projected_packet = project_packet(filtered_packets[projection.filter_name], projection.fields)
+                socketio.emit(site_name, encode_packet(projected_packet, site_name),
+                              to=get_projection_room(site_name, projection))
+            except Exception as e:
+                logging.error(
+                    f"Failed to send {get_projection_room(site_name, projection)} packet for {site_name}:\n{traceback.format_exc()}")
+
         logging.info(f"Successfully created JSON packet for {site_name}")
     except KeyError as k:
         logging.warning(
             f"Failed to create JSON packet for {site_name}, missing data field: {k}")
+
+
+def network_frame_emitter(socketio):
+    """Periodically sends the latest state of every radar as one network frame to the network room."""
+    while True:
+        eventlet.sleep(NETWORK_FRAME_INTERVAL)
+
+        try:
+            socketio.emit('network', encode_json(build_network_frame()), to=NETWORK_ROOM)
+            logging.debug("Successfully sent network frame")
+        except Exception as e:
+            logging.error(f"Failed to send network frame:\n{traceback.format_exc()}")
@@ -0,0 +1,194 @@
+"""
+Subscriptions to a filtered and/or projected beam packet, so clients only receive the
+echoes and fields they plot.
+
+A client subscribes with `socket.emit('subscribe', {site: 'kod', fields: ['velocity', 'g_scatter'], filter: 'quality'})`,
+where `fields` selects the beam fields to receive and `filter` a filter preset (see `filter_dmap.py`).
+Subscribers with identical projections share a room, so each projected packet is built
+and encoded once per packet and sent to the whole room. The projected packet is still sent
+on the `site_name` event, so clients handle it the same way as the full packet.
+Clients that have not subscribed to a site keep receiving the full, unfiltered packet, which is
+sent to the site's full packet room. Every client is in that room until it subscribes to the site.
+"""
+import logging
+from typing import NamedTuple
+from flask import request
+from flask_socketio import join_room, leave_room
+from .data_processing.filter_dmap import get_filter_presets
+from .data_processing.network_frame import build_network_frame
+from .json_encoding import encode_json
+
+# Fields of the beam packet (see `dmap_to_json`) that can be selected with a subscription.
+# All other fields (site_name, beam, time, etc.) are always sent.
+PROJECTABLE_FIELDS = frozenset(["power", "velocity", "width", "elevation", "g_scatter", "gflg", "v"])
+
+# Room for overview clients receiving the periodic network frames (see network_frame.py)
+NETWORK_ROOM = 'network'
+
+
+class Projection(NamedTuple):
+    """The filter preset (None for unfiltered) and fields a client is subscribed to"""
+    filter_name: str | None
+    fields: frozenset
+
+
+# Sids subscribed to each projection, keyed by site name then by projection
+projection_groups = {}
+
+# The projection each client is subscribed to, keyed by sid then by site name
+client_subscriptions = {}
+
+# Sids of the connected clients
+connected_sids = set()
+
+# Sites that have sent data, which have a full packet room
+known_sites = set()
+
+
+def get_full_packet_room(site_name: str) -> str:
+    """Name of the room for clients receiving the full packet of `site_name` (i.e. not subscribed to it)"""
+    return f"{site_name}/full"
+
+
+def add_known_site(socketio, site_name: str):
+    """
+    Create the full packet room of a site the first time it sends data, by adding every
+    connected client that has not subscribed to the site. Clients that connect later join
+    the rooms of all known sites when they connect.
+    """
+    if site_name in known_sites:
+        return
+
+    known_sites.add(site_name)
+    for sid in connected_sids:
+        if site_name not in client_subscriptions.get(sid, {}):
+            socketio.server.enter_room(sid, get_full_packet_room(site_name), namespace='/')
+
+
+def get_projection_room(site_name: str, projection: Projection) -> str:
+    """Name of the room for clients subscribed to `projection` of `site_name`"""
+    fields = ','.join(sorted(projection.fields))
+
+    if projection.filter_name is None:
+        return f"{site_name}/fields/{fields}"
+
+    return f"{site_name}/filter/{projection.filter_name}/fields/{fields}"
+
+
+def get_projections(site_name: str) -> list[Projection]:
+    """The distinct projections currently subscribed to for `site_name`"""
+    return list(projection_groups.get(site_name, {}))
+
+
+def project_packet(packet: dict, fields: frozenset) -> dict:
+    """Remove the projectable fields that are not in `fields` from a beam packet"""
+    return {key: value for key, value in packet.items() if key in fields or key not in PROJECTABLE_FIELDS}
+
+
+def subscribe(sid: str, site_name: str, projection: Projection):
+    """Subscribe a client to `projection` of `site_name`, replacing its previous subscription to the site"""
+    unsubscribe(sid, site_name)
+
+    projection_groups.setdefault(site_name, {}).setdefault(projection, set()).add(sid)
+    client_subscriptions.setdefault(sid, {})[site_name] = projection
+    leave_room(get_full_packet_room(site_name), sid=sid)
+    join_room(get_projection_room(site_name, projection), sid=sid)
+
+
+def unsubscribe(sid: str, site_name: str):
+    """Remove a client's subscription to `site_name`, so it receives the full packet again"""
+    projection = client_subscriptions.get(sid, {}).pop(site_name, None)
+    if projection is None:
+        return
+
+    groups = projection_groups[site_name]
+    groups[projection].discard(sid)
+    if not groups[projection]:
+        del groups[projection]
+    if not groups:
+        del projection_groups[site_name]
+
+    leave_room(get_projection_room(site_name, projection), sid=sid)
+    if sid in connected_sids:
+        join_room(get_full_packet_room(site_name), sid=sid)
+
+
+def register_subscription_handlers(socketio):
+    """Register the Socket.IO event handlers for subscriptions"""
+
+    @socketio.on('connect')
+    def handle_connect(*args):
+        connected_sids.add(request.sid)
+        for site_name in known_sites:
+            join_room(get_full_packet_room(site_name))
+
+    @socketio.on('subscribe')
+    def handle_subscribe(data):
+        site_name = data.get('site') if isinstance(data, dict) else None
+        fields = data.get('fields') if isinstance(data, dict) else None
+        filter_name = data.get('filter') if isinstance(data, dict) else None
+
+        if not site_name or not isinstance(site_name, str):
+            return {"error": "Missing required field: site"}
+
+        if fields is not None and (not isinstance(fields, list) or not all(isinstance(field, str) for field in fields)):
+            return {"error": "Invalid fields. Must be a list of field names"}
+
+        if filter_name is not None and not isinstance(filter_name, str):
+            return {"error": "Invalid filter. Must be the name of a filter preset"}
+
+        if fields is None and filter_name is None:
+            # No projection, receive the full packet
+            unsubscribe(request.sid, site_name)
+            return {"site": site_name, "fields": sorted(PROJECTABLE_FIELDS), "filter": None}
+
+        fields = PROJECTABLE_FIELDS if fields is None else frozenset(fields)
+        invalid_fields = fields - PROJECTABLE_FIELDS
+        if invalid_fields:
+            return {"error": f"Invalid fields: {', '.join(sorted(invalid_fields))}. Must be any of: {', '.join(sorted(PROJECTABLE_FIELDS))}"}
+
+        filter_presets = get_filter_presets(site_name)
+        if filter_name is not None and filter_name not in filter_presets:
+            return {"error": f"Invalid filter: {filter_name}. Must be one of: {', '.join(sorted(filter_presets))}"}
+
+        subscribe(request.sid, site_name, Projection(filter_name, fields))
+        logging.debug(f"Client {request.sid} subscribed to {sorted(fields)} of {site_name} (filter: {filter_name})")
+
+        return {"site": site_name, "fields": sorted(fields), "filter": filter_name}
+
+    @socketio.on('unsubscribe')
+    def handle_unsubscribe(data):
+        site_name = data.get('site') if isinstance(data, dict) else None
+
+        if not site_name or not isinstance(site_name, str):
+            return {"error": "Missing required field: site"}
+
+        unsubscribe(request.sid, site_name)
+        return {"site": site_name, "fields": sorted(PROJECTABLE_FIELDS), "filter": None}
+
+    @socketio.on('filters')
+    def handle_filters(data):
+        """Returns the filter presets available for a site"""
+        site_name = data.get('site') if isinstance(data, dict) else None
+
+        if not site_name or not isinstance(site_name, str):
+            return {"error": "Missing required field: site"}
+
+        return get_filter_presets(site_name)
+
+    @socketio.on('subscribe_network')
+    def handle_subscribe_network(*args):
+        """Join the network room and receive the current network frame straight away"""
+        join_room(NETWORK_ROOM)
+        socketio.emit('network', encode_json(build_network_frame()), to=request.sid)
+
+    @socketio.on('unsubscribe_network')
+    def handle_unsubscribe_network(*args):
+        leave_room(NETWORK_ROOM)
+
+    @socketio.on('disconnect')
+    def handle_disconnect(*args):
+        connected_sids.discard(request.sid)
+        for site_name in list(client_subscriptions.get(request.sid, {})):
+            unsubscribe(request.sid, site_name)
+        client_subscriptions.pop(request.sid, None)
@@ -0,0 +1,50 @@
+"""
+Measures server startup time, i.e. how long a restart keeps viewers disconnected.
+
+Each run starts a fresh interpreter (so import caches are cold) that imports the app,
+calls `create_app()` and reports how long each step took. Radar listeners are started
+in the background once the server is accepting connections, so they are not included.
+
+Usage: python benchmarks/startup_time.py [runs]
+"""
+import os
+import sys
+import json
+import statistics
+import subprocess
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+STARTUP_SCRIPT = """
+import json
+import time
+
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app()
+created = time.perf_counter()
+
+print(json.dumps({"import": imported - start, "create_app": created - imported, "total": created - start}))
+"""
+
+
+def measure_startup() -> dict[str, float]:
+    """Run one cold startup in a subprocess and return the timings in seconds."""
+    result = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    timings = [measure_startup() for _ in range(runs)]
+
+    print(f"Startup time over {runs} runs (median / max):")
+    for step in ("import", "create_app", "total"):
+        values = [t[step] for t in timings]
+        print(f"  {step:<10} {statistics.median(values) * 1000:8.1f} ms / {max(values) * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()